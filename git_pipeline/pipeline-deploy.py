@@ -1,17 +1,76 @@
 #!/usr/bin/env python3
 
+import argparse
 import boto3
+import botocore.session
+import concurrent.futures
+import functools
+import hashlib
 import json
+import logging
 import sys
 import time
 import os
+import re
+import secrets
 import yaml
-import uuid
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
+
+# Prefer orjson for policy/template (de)serialization when it is installed
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+
+def _dumps(obj):
+    """Serializes obj to a JSON str (orjson returns bytes, boto3 expects str)"""
+    data = _json.dumps(obj)
+    return data.decode() if isinstance(data, bytes) else data
+
+
+# Use the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
+class _CfnLoader(_SafeLoader):
+    """Safe YAML loader that also accepts CloudFormation short-form intrinsics (!Ref, !Sub, ...)"""
+
+
+def _construct_cfn_tag(loader, tag_suffix, node):
+    """Keeps the node's value for short-form intrinsics; only resource types matter for analysis"""
+    if isinstance(node, yaml.MappingNode):
+        return loader.construct_mapping(node)
+    if isinstance(node, yaml.SequenceNode):
+        return loader.construct_sequence(node)
+    return loader.construct_scalar(node)
+
+
+_CfnLoader.add_multi_constructor('!', _construct_cfn_tag)
+
+# On-disk cache of parsed template resource types, kept next to this script
+RESOURCE_TYPES_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pipeline-deploy-cache.json')
+RESOURCE_TYPES_CACHE_SIZE = 64  # Also bounds the in-memory analysis cache
+
+# Retries while a newly created pipeline role propagates through IAM
+PIPELINE_CREATE_ATTEMPTS = 5
+PIPELINE_CREATE_RETRY_DELAY = 5
+
+# Characters not allowed in S3 bucket names
+_S3_BUCKET_INVALID_CHARS = re.compile(r'[^a-z0-9.-]+')
+
+# Permission strings repeat across the mappings below; interning them lets
+# every occurrence share a single string object
+_i = sys.intern
+
 # Define a mapping of CloudFormation resource types to IAM permissions
 # This is a starting point and should be expanded for production use
-CFN_RESOURCE_TO_IAM_MAPPING = {
+CFN_RESOURCE_TO_IAM_MAPPING = {_i(k): frozenset(_i(a) for a in v) for k, v in {
     'AWS::S3::Bucket': [
         's3:CreateBucket',
         's3:DeleteBucket',
@@ -112,10 +171,10 @@ CFN_RESOURCE_TO_IAM_MAPPING = {
         'rolesanywhere:TagResource'
     ],
     # Add more mappings as needed
-}
+}.items()}
 
 # Always needed CloudFormation permissions
-CLOUDFORMATION_PERMISSIONS = [
+CLOUDFORMATION_PERMISSIONS = [_i(a) for a in [
     'cloudformation:CreateStack',
     'cloudformation:DeleteStack',
     'cloudformation:DescribeStacks',
@@ -123,10 +182,10 @@ CLOUDFORMATION_PERMISSIONS = [
     'cloudformation:ValidateTemplate',
     'cloudformation:GetTemplate',
     'cloudformation:GetTemplateSummary'
-]
+]]
 
 # Pipeline specific permissions
-PIPELINE_PERMISSIONS = [
+PIPELINE_PERMISSIONS = [_i(a) for a in [
     # CodePipeline permissions
     'codepipeline:CreatePipeline',
     'codepipeline:DeletePipeline',
@@ -142,7 +201,190 @@ PIPELINE_PERMISSIONS = [
     's3:GetObject',
     's3:PutObject',
     's3:DeleteObject'
-]
+]]
+
+# Permissions every scoped execution role gets, regardless of template resources
+_BASE_PERMISSIONS = frozenset(CLOUDFORMATION_PERMISSIONS) | frozenset(PIPELINE_PERMISSIONS)
+
+# Static IAM policy documents, serialized once at import
+# Trust policy for stack role with scoped permissions
+_STACK_TRUST_POLICY_JSON = _dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {
+                "Service": [
+                    "cloudformation.amazonaws.com",
+                    "codepipeline.amazonaws.com"
+                ]
+            },
+            "Action": "sts:AssumeRole"
+        }
+    ]
+})
+
+# Trust policy for pipeline role
+_PIPELINE_TRUST_POLICY_JSON = _dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {
+                "Service": "codepipeline.amazonaws.com"
+            },
+            "Action": "sts:AssumeRole"
+        }
+    ]
+})
+
+# Trust policy for CloudFormation role
+_CF_TRUST_POLICY_JSON = _dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {
+                "Service": "cloudformation.amazonaws.com"
+            },
+            "Action": "sts:AssumeRole"
+        }
+    ]
+})
+
+# Policy document for pipeline role; the account ID is filled in per role
+_ACCOUNT_ID_PLACEHOLDER = '__ACCOUNT_ID__'
+_PIPELINE_ROLE_POLICY_JSON_TMPL = _dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Action": [
+                "cloudformation:CreateStack",
+                "cloudformation:DeleteStack",
+                "cloudformation:DescribeStacks",
+                "cloudformation:UpdateStack",
+                "cloudformation:CreateChangeSet",
+                "cloudformation:DeleteChangeSet",
+                "cloudformation:DescribeChangeSet",
+                "cloudformation:ExecuteChangeSet",
+                "cloudformation:SetStackPolicy",
+                "cloudformation:ValidateTemplate"
+            ],
+            "Resource": f"arn:aws:cloudformation:*:{_ACCOUNT_ID_PLACEHOLDER}:stack/*"
+        },
+        {
+            "Effect": "Allow",
+            "Action": [
+                "iam:PassRole"
+            ],
+            "Resource": "*",
+            "Condition": {
+                "StringEqualsIfExists": {
+                    "iam:PassedToService": [
+                        "cloudformation.amazonaws.com",
+                        "elasticbeanstalk.amazonaws.com"
+                    ]
+                }
+            }
+        },
+        {
+            "Effect": "Allow",
+            "Action": [
+                "codestar-connections:UseConnection"
+            ],
+            "Resource": "*"
+        },
+        {
+            "Effect": "Allow", 
+            "Action": [
+                "s3:GetObject",
+                "s3:GetObjectVersion",
+                "s3:GetBucketVersioning",
+                "s3:PutObject"
+            ],
+            "Resource": "*"
+        }
+    ]
+})
+
+
+def _load_resource_types_cache():
+    """Loads the on-disk cache of template hash -> resource types, or an empty dict"""
+    try:
+        with open(RESOURCE_TYPES_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_resource_types_cache(cache):
+    """Writes the resource types cache, keeping only the most recent entries"""
+    entries = list(cache.items())[-RESOURCE_TYPES_CACHE_SIZE:]
+    try:
+        with open(RESOURCE_TYPES_CACHE_FILE, 'w') as f:
+            json.dump(dict(entries), f)
+    except OSError:
+        # The cache is only an optimization, so a read-only location is fine
+        pass
+
+
+def _extract_resource_types(template_content):
+    """
+    Returns the set of resource types declared in a CloudFormation template.
+    
+    Parsed results are cached on disk keyed by a hash of the template content,
+    so re-analyzing an unchanged template skips parsing entirely.
+    
+    Raises:
+        yaml.YAMLError: If the template is neither valid JSON nor valid YAML
+    """
+    content_bytes = template_content.encode('utf-8') if isinstance(template_content, str) else template_content
+    cache_key = hashlib.blake2b(content_bytes).hexdigest()
+    
+    cache = _load_resource_types_cache()
+    if cache_key in cache:
+        return frozenset(cache[cache_key])
+    
+    # Parse the template (could be either JSON or YAML). Most CloudFormation
+    # templates are YAML, so only try JSON first when the content looks like it
+    if template_content.lstrip()[:1] in ('{', '[', b'{', b'['):
+        try:
+            template = _json.loads(template_content)
+        except ValueError:
+            template = yaml.load(template_content, Loader=_CfnLoader)
+    else:
+        template = yaml.load(template_content, Loader=_CfnLoader)
+    
+    # Extract resource types
+    resources = template.get('Resources', {})
+    resource_types = {rd.get('Type') for rd in resources.values() if rd.get('Type')}
+    
+    cache[cache_key] = sorted(resource_types)
+    _save_resource_types_cache(cache)
+    
+    return frozenset(resource_types)
+
+
+@functools.lru_cache(maxsize=RESOURCE_TYPES_CACHE_SIZE)
+def _compute_permissions(template_content):
+    """
+    Determines the IAM permissions needed to deploy a CloudFormation template.
+    
+    Args:
+        template_content (str or bytes): The CloudFormation template content (JSON or YAML)
+        
+    Returns:
+        tuple: (resource_types, needed_permissions, unmapped_types) as frozensets
+    """
+    resource_types = _extract_resource_types(template_content)
+    
+    # Map resource types to permissions
+    known_types = resource_types & CFN_RESOURCE_TO_IAM_MAPPING.keys()
+    needed_permissions = set(_BASE_PERMISSIONS)  # Start with CF and pipeline permissions
+    needed_permissions.update(*map(CFN_RESOURCE_TO_IAM_MAPPING.__getitem__, known_types))
+    
+    return resource_types, frozenset(needed_permissions), resource_types - known_types
 
 
 def analyze_template_content_and_create_role(template_content, role_name, iam_client, account_id):
@@ -150,7 +392,7 @@ def analyze_template_content_and_create_role(template_content, role_name, iam_cl
     Analyzes CloudFormation template content and creates a role with necessary permissions.
     
     Args:
-        template_content (str): The CloudFormation template content (JSON or YAML)
+        template_content (str or bytes): The CloudFormation template content (JSON or YAML)
         role_name (str): Name for the new IAM role
         iam_client: Boto3 IAM client
         account_id (str): AWS account ID
@@ -161,86 +403,53 @@ def analyze_template_content_and_create_role(template_content, role_name, iam_cl
     print(f"Analyzing CloudFormation template content")
     
     try:
-        # Parse the template (could be either JSON or YAML)
         try:
-            template = json.loads(template_content)
-        except json.JSONDecodeError:
-            try:
-                template = yaml.safe_load(template_content)
-            except yaml.YAMLError as e:
-                print(f"Error parsing template content: {e}")
-                return None
-        
-        # Extract resource types
-        resources = template.get('Resources', {})
-        resource_types = set()
-        
-        for resource_name, resource_def in resources.items():
-            resource_type = resource_def.get('Type')
-            if resource_type:
-                resource_types.add(resource_type)
+            resource_types, needed_permissions, unmapped_types = _compute_permissions(template_content)
+        except yaml.YAMLError as e:
+            print(f"Error parsing template content: {e}")
+            return None
         
         if resource_types:
-            print(f"Found resource types: {', '.join(resource_types)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Found resource types: %s", ', '.join(resource_types))
         else:
             print("No resources found in template.")
             return None
         
-        # Map resource types to permissions
-        needed_permissions = set(CLOUDFORMATION_PERMISSIONS)  # Start with CF permissions
-        needed_permissions.update(PIPELINE_PERMISSIONS)  # Add pipeline permissions
-        
-        for resource_type in resource_types:
-            if resource_type in CFN_RESOURCE_TO_IAM_MAPPING:
-                needed_permissions.update(CFN_RESOURCE_TO_IAM_MAPPING[resource_type])
-            else:
-                print(f"Warning: No permission mapping for resource type: {resource_type}")
+        for resource_type in unmapped_types:
+            print(f"Warning: No permission mapping for resource type: {resource_type}")
         
-        print(f"Required permissions: {', '.join(sorted(needed_permissions))}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Required permissions: %s", ', '.join(sorted(needed_permissions)))
         
-        # Create the role
-        # Trust policy for stack role
-        trust_policy = {
+        # Create policy document with needed permissions, serialized up front
+        # so nothing but the IAM calls runs between create_role and put_role_policy
+        permission_policy = {
             "Version": "2012-10-17",
             "Statement": [
                 {
                     "Effect": "Allow",
-                    "Principal": {
-                        "Service": [
-                            "cloudformation.amazonaws.com",
-                            "codepipeline.amazonaws.com"
-                        ]
-                    },
-                    "Action": "sts:AssumeRole"
+                    "Action": list(needed_permissions),
+                    "Resource": "*"  # Note: In production, you'd want to scope this down
                 }
             ]
         }
+        permission_policy_json = _dumps(permission_policy)
+        policy_name = f"{role_name}Policy"
         
+        # Create the role
         try:
             response = iam_client.create_role(
                 RoleName=role_name,
-                AssumeRolePolicyDocument=json.dumps(trust_policy),
+                AssumeRolePolicyDocument=_STACK_TRUST_POLICY_JSON,
                 Description=f"CloudFormation and CodePipeline execution role with scoped permissions"
             )
             
-            # Create policy document with needed permissions
-            permission_policy = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Action": list(needed_permissions),
-                        "Resource": "*"  # Note: In production, you'd want to scope this down
-                    }
-                ]
-            }
-            
             # Attach the policy
-            policy_name = f"{role_name}Policy"
             iam_client.put_role_policy(
                 RoleName=role_name,
                 PolicyName=policy_name,
-                PolicyDocument=json.dumps(permission_policy)
+                PolicyDocument=permission_policy_json
             )
             
             print(f"Created execution role with scoped permissions: {role_name}")
@@ -261,87 +470,20 @@ def create_pipeline_role(role_name, iam_client, account_id):
     """Creates a role for CodePipeline to deploy CloudFormation stacks"""
     print(f"Creating pipeline service role: {role_name}")
     
-    # Trust policy for pipeline role
-    trust_policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Principal": {
-                    "Service": "codepipeline.amazonaws.com"
-                },
-                "Action": "sts:AssumeRole"
-            }
-        ]
-    }
+    pipeline_policy_json = _PIPELINE_ROLE_POLICY_JSON_TMPL.replace(_ACCOUNT_ID_PLACEHOLDER, account_id)
     
     try:
         response = iam_client.create_role(
             RoleName=role_name,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
+            AssumeRolePolicyDocument=_PIPELINE_TRUST_POLICY_JSON,
             Description="Role for CodePipeline to deploy CloudFormation stacks"
         )
         
-        # Create policy document for pipeline role
-        pipeline_policy = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Action": [
-                        "cloudformation:CreateStack",
-                        "cloudformation:DeleteStack",
-                        "cloudformation:DescribeStacks",
-                        "cloudformation:UpdateStack",
-                        "cloudformation:CreateChangeSet",
-                        "cloudformation:DeleteChangeSet",
-                        "cloudformation:DescribeChangeSet",
-                        "cloudformation:ExecuteChangeSet",
-                        "cloudformation:SetStackPolicy",
-                        "cloudformation:ValidateTemplate"
-                    ],
-                    "Resource": f"arn:aws:cloudformation:*:{account_id}:stack/*"
-                },
-                {
-                    "Effect": "Allow",
-                    "Action": [
-                        "iam:PassRole"
-                    ],
-                    "Resource": "*",
-                    "Condition": {
-                        "StringEqualsIfExists": {
-                            "iam:PassedToService": [
-                                "cloudformation.amazonaws.com",
-                                "elasticbeanstalk.amazonaws.com"
-                            ]
-                        }
-                    }
-                },
-                {
-                    "Effect": "Allow",
-                    "Action": [
-                        "codestar-connections:UseConnection"
-                    ],
-                    "Resource": "*"
-                },
-                {
-                    "Effect": "Allow", 
-                    "Action": [
-                        "s3:GetObject",
-                        "s3:GetObjectVersion",
-                        "s3:GetBucketVersioning",
-                        "s3:PutObject"
-                    ],
-                    "Resource": "*"
-                }
-            ]
-        }
-        
         # Create and attach the policy
         iam_client.put_role_policy(
             RoleName=role_name,
             PolicyName=f"{role_name}Policy",
-            PolicyDocument=json.dumps(pipeline_policy)
+            PolicyDocument=pipeline_policy_json
         )
         
         # Return the role ARN
@@ -356,24 +498,10 @@ def create_cloudformation_role(role_name, iam_client):
     """Creates the CloudFormation execution role with admin permissions"""
     print(f"Creating CloudFormation execution role with admin permissions: {role_name}")
     
-    # Trust policy for CloudFormation role
-    trust_policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Principal": {
-                    "Service": "cloudformation.amazonaws.com"
-                },
-                "Action": "sts:AssumeRole"
-            }
-        ]
-    }
-    
     try:
         response = iam_client.create_role(
             RoleName=role_name,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
+            AssumeRolePolicyDocument=_CF_TRUST_POLICY_JSON,
             Description="CloudFormation execution role with administrator access"
         )
         
@@ -391,12 +519,11 @@ def create_cloudformation_role(role_name, iam_client):
         sys.exit(1)
 
 
-def create_artifact_bucket(session, region):
+def create_artifact_bucket(session, region, account_id):
     """
     Creates an S3 bucket for CodePipeline artifacts with valid naming conventions
     """
     s3_client = session.client('s3')
-    account_id = session.client('sts').get_caller_identity()['Account']
     
     # Generate a bucket name that follows S3 naming conventions:
     # - 3-63 characters
@@ -408,7 +535,7 @@ def create_artifact_bucket(session, region):
     region_lower = region.lower()
     
     # Create a unique suffix limited to ensure we don't exceed 63 characters
-    unique_suffix = str(uuid.uuid4())[:8].lower()
+    unique_suffix = secrets.token_hex(4)
     
     # Build a bucket name with prefix + region + account id + unique suffix
     # with account ID shortened if necessary to stay under the 63 char limit
@@ -416,13 +543,11 @@ def create_artifact_bucket(session, region):
     
     bucket_name = f"pipeline-{region_lower}-{account_id_short}-{unique_suffix}"
     
-    # Ensure the bucket name is not too long (max 63 chars)
-    if len(bucket_name) > 63:
-        bucket_name = bucket_name[:63]
-    
-    # Ensure the bucket name doesn't end with a dash or dot
-    if bucket_name[-1] in ['-', '.']:
-        bucket_name = bucket_name[:-1] + 'a'
+    # Drop invalid characters, cap at 63 chars and make sure it begins and
+    # ends with a letter or number
+    bucket_name = _S3_BUCKET_INVALID_CHARS.sub('', bucket_name)[:63].strip('-.')
+    if len(bucket_name) < 3:
+        bucket_name = f"pipeline-{secrets.token_hex(4)}"
     
     try:
         if region == 'us-east-1':
@@ -439,6 +564,26 @@ def create_artifact_bucket(session, region):
         sys.exit(1)
 
 
+def create_pipeline(pipeline_client, pipeline_definition):
+    """
+    Creates the pipeline, retrying while its newly created service role is
+    not yet assumable (IAM changes are eventually consistent)
+    """
+    for attempt in range(1, PIPELINE_CREATE_ATTEMPTS + 1):
+        try:
+            return pipeline_client.create_pipeline(pipeline=pipeline_definition)
+        except ClientError as e:
+            error = e.response.get('Error', {})
+            role_not_ready = (
+                error.get('Code') == 'InvalidStructureException'
+                and 'AssumeRole' in error.get('Message', '')
+            )
+            if not role_not_ready or attempt == PIPELINE_CREATE_ATTEMPTS:
+                raise
+            print("Waiting for the pipeline role to become available...")
+            time.sleep(PIPELINE_CREATE_RETRY_DELAY)
+
+
 def select_option(options):
     """Displays a selection menu and returns the selected option"""
     print("Available options:")
@@ -456,24 +601,133 @@ def select_option(options):
             print("Please enter a number.")
 
 
-def main():
-    # Check if profile argument is provided
-    if len(sys.argv) < 2:
-        print(f"Usage: {sys.argv[0]} <aws-profile>")
-        print("Please provide an AWS CLI profile name")
+def select_connection(codestar_client, aws_profile):
+    """Lists CodeStar connections and returns the (ARN, name) of the one the user selects"""
+    # Get connections and format them
+    print(f"Fetching CodeStar connections using profile: {aws_profile}...")
+    # list_connections has no boto3 paginator, so follow NextToken manually
+    connections = []
+    list_kwargs = {}
+    while True:
+        connections_response = codestar_client.list_connections(**list_kwargs)
+        connections.extend(connections_response.get('Connections', []))
+        next_token = connections_response.get('NextToken')
+        if not next_token:
+            break
+        list_kwargs['NextToken'] = next_token
+    
+    if not connections:
+        print("No CodeStar connections found. Please create a connection first.")
         sys.exit(1)
     
-    aws_profile = sys.argv[1]
+    connection_map = {conn['ConnectionName']: conn['ConnectionArn'] for conn in connections}
     
-    # Initialize session with profile
-    session = boto3.Session(profile_name=aws_profile)
-    default_region = session.region_name
+    # Display connections for selection
+    print("Available connections:")
+    selected_connection = select_option(list(connection_map))
+    
+    # Get the corresponding ARN
+    return connection_map[selected_connection], selected_connection
+
+
+def confirm_admin_fallback(non_interactive):
+    """Asks whether to create an admin role after a scoped role could not be created"""
+    if non_interactive:
+        print("Failed to create scoped role.")
+        sys.exit(1)
+    create_admin_role = input("Failed to create scoped role. Create a role with admin permissions instead? (y/n): ").lower()
+    return create_admin_role == 'y'
+
+
+def prompt(value, message):
+    """Returns value if it was given on the command line, otherwise asks for it"""
+    return value if value is not None else input(message)
+
+
+def parse_args(argv=None):
+    """
+    Parses command line arguments.
+    
+    Any setting not given on the command line is asked for interactively. With
+    --yes, nothing is asked: missing optional settings are left unset and the
+    deployment is confirmed automatically, so the required ones must be given.
+    """
+    parser = argparse.ArgumentParser(
+        description="Create a CodePipeline that deploys a CloudFormation template from a Git repository"
+    )
+    parser.add_argument('profile', help="AWS CLI profile name")
+    parser.add_argument('--region', help="AWS region to deploy to (default: the profile's region)")
+    parser.add_argument('--connection-arn', help="ARN of the CodeStar connection to the Git provider")
+    parser.add_argument('--repository', help="Repository name, e.g. username/repository")
+    parser.add_argument('--branch', help="Branch name, e.g. main")
+    parser.add_argument('--stack-name', help="CloudFormation stack name")
+    parser.add_argument('--template-path', help="Template path relative to the repository root")
+    parser.add_argument('--deployment-file', help="Deployment configuration file path relative to the repository root")
+    parser.add_argument('--params-file', help="Parameters file path relative to the repository root")
+    parser.add_argument('--role-mode', choices=['admin', 'scoped'],
+                        help="Create a CloudFormation execution role with admin or template-scoped permissions")
+    parser.add_argument('--local-template', help="Local template file to analyze for --role-mode scoped")
+    parser.add_argument('--cf-role-arn', help="Use an existing CloudFormation execution role instead of creating one")
+    parser.add_argument('--iam-capabilities', action='store_true', default=None,
+                        help="Enable CAPABILITY_IAM and CAPABILITY_NAMED_IAM for the stack")
+    parser.add_argument('--start-pipeline', action='store_true', default=None,
+                        help="Manually start the pipeline after creating it")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="Run non-interactively and skip the deployment confirmation")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="Do not print resource types and permissions found during template analysis")
+    args = parser.parse_args(argv)
+    
+    if args.cf_role_arn and args.role_mode:
+        parser.error("--cf-role-arn cannot be combined with --role-mode")
+    
+    if args.yes:
+        missing = [
+            option for option, value in (
+                ('--connection-arn', args.connection_arn),
+                ('--repository', args.repository),
+                ('--branch', args.branch),
+                ('--stack-name', args.stack_name),
+                ('--template-path', args.template_path),
+            ) if value is None
+        ]
+        if not (args.role_mode or args.cf_role_arn):
+            missing.append('--role-mode or --cf-role-arn')
+        if args.role_mode == 'scoped' and not args.local_template:
+            missing.append('--local-template')
+        if missing:
+            parser.error(f"--yes requires {', '.join(missing)}")
+    
+    return args
+
+
+def main():
+    args = parse_args()
+    aws_profile = args.profile
+    
+    # Verbose analysis output goes through this script's logger so it can be
+    # silenced; boto3/botocore loggers stay at their default WARNING level
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING if args.quiet else logging.INFO)
+    
+    # Initialize a single core session with the profile; credentials and config
+    # are resolved once and shared by the boto3 session created below
+    core_session = botocore.session.Session(profile=aws_profile)
+    default_region = core_session.get_config_variable('region')
     
     # Ask if user wants to use a custom region
-    use_custom_region = input(f"Default region from profile is {default_region}. Do you want to use a different region? (y/n): ").lower()
-    if use_custom_region == 'y':
+    if args.region or args.yes:
+        use_custom_region = 'n'
+    else:
+        use_custom_region = input(f"Default region from profile is {default_region}. Do you want to use a different region? (y/n): ").lower()
+    if args.region:
+        region = args.region
+        print(f"Using region: {region}")
+    elif use_custom_region == 'y':
         # List available regions for selection
-        ec2_client = session.client('ec2')
+        ec2_client = core_session.create_client('ec2', region_name=default_region)
         regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
         print("Available regions:")
         selected_region = select_option(regions)
@@ -483,8 +737,8 @@ def main():
         region = default_region
         print(f"Using default region: {region}")
     
-    # Re-initialize session with the selected region
-    session = boto3.Session(profile_name=aws_profile, region_name=region)
+    # Create the boto3 session for the selected region on top of the core session
+    session = boto3.Session(botocore_session=core_session, region_name=region)
     iam_client = session.client('iam')
     sts_client = session.client('sts')
     cf_client = session.client('cloudformation')
@@ -494,113 +748,122 @@ def main():
     # Get account ID
     account_id = sts_client.get_caller_identity()['Account']
     
-    # Get connections and format them
-    print(f"Fetching CodeStar connections using profile: {aws_profile}...")
     try:
-        connections_response = codestar_client.list_connections()
-        connections = connections_response.get('Connections', [])
-        
-        if not connections:
-            print("No CodeStar connections found. Please create a connection first.")
-            sys.exit(1)
-        
-        connection_names = [conn['ConnectionName'] for conn in connections]
-        connection_arns = [conn['ConnectionArn'] for conn in connections]
-        
-        # Display connections for selection
-        print("Available connections:")
-        selected_connection = select_option(connection_names)
-        
-        # Get the corresponding ARN
-        connection_arn = connection_arns[connection_names.index(selected_connection)]
+        if args.connection_arn:
+            connection_arn = selected_connection = args.connection_arn
+        else:
+            connection_arn, selected_connection = select_connection(codestar_client, aws_profile)
         
         # Get repository details
-        repository = input("Enter repository name (e.g., username/repository): ")
-        branch = input("Enter branch name (e.g., main): ")
-        stack_name = input("Enter stack name: ")
-        template_path = input("Enter template path (relative to repository root, e.g., templates/my-template.yaml): ")
+        repository = prompt(args.repository, "Enter repository name (e.g., username/repository): ")
+        branch = prompt(args.branch, "Enter branch name (e.g., main): ")
+        stack_name = prompt(args.stack_name, "Enter stack name: ")
+        template_path = prompt(args.template_path, "Enter template path (relative to repository root, e.g., templates/my-template.yaml): ")
         
         # Ask for deployment file
-        use_deployment_file = input("Do you want to use a deployment configuration file from the repository? (y/n): ").lower()
-        deployment_file_path = None
-        if use_deployment_file == 'y':
-            deployment_file_path = input("Enter deployment file path (relative to repository root, e.g., deployment-file.yaml): ")
+        deployment_file_path = args.deployment_file
+        if deployment_file_path is None and not args.yes:
+            use_deployment_file = input("Do you want to use a deployment configuration file from the repository? (y/n): ").lower()
+            if use_deployment_file == 'y':
+                deployment_file_path = input("Enter deployment file path (relative to repository root, e.g., deployment-file.yaml): ")
         
         # Ask for parameters file (traditional CloudFormation parameters format) 
         # Only if not using deployment file
         params_file_path = None
         if not deployment_file_path:
-            use_params_file = input("Do you want to use a parameters file from the repository? (y/n): ").lower()
-            if use_params_file == 'y':
-                params_file_path = input("Enter parameters file path (relative to repository root, e.g., params/dev.json): ")
-        
-        # Create pipeline role
-        pipeline_role_name = f"CodePipeline-{stack_name}-{str(uuid.uuid4())[:8]}"
-        pipeline_role_arn = create_pipeline_role(pipeline_role_name, iam_client, account_id)
-        print(f"Created pipeline role with ARN: {pipeline_role_arn}")
+            params_file_path = args.params_file
+            if params_file_path is None and not args.yes:
+                use_params_file = input("Do you want to use a parameters file from the repository? (y/n): ").lower()
+                if use_params_file == 'y':
+                    params_file_path = input("Enter parameters file path (relative to repository root, e.g., params/dev.json): ")
         
         # Handle CloudFormation execution role
-        create_cf_role_input = input("Do you want to create a new CloudFormation execution role? (y/n): ").lower()
+        if args.cf_role_arn:
+            create_cf_role_input = 'n'
+        elif args.role_mode:
+            create_cf_role_input = 'y'
+        else:
+            create_cf_role_input = input("Do you want to create a new CloudFormation execution role? (y/n): ").lower()
         cf_role_arn = None
+        cf_role_name = f"CloudFormation-{stack_name}-{secrets.token_hex(4)}"
+        # Function and arguments that create the CloudFormation role, if one is needed
+        cf_role_task = None
+        role_type = None
         
         if create_cf_role_input == 'y':
-            role_type = input("Create (1) A role with full admin permissions, or (2) A role with minimum required permissions? (1/2): ")
-            cf_role_name = f"CloudFormation-{stack_name}-{str(uuid.uuid4())[:8]}"
+            role_type = prompt(
+                {'admin': '1', 'scoped': '2'}.get(args.role_mode),
+                "Create (1) A role with full admin permissions, or (2) A role with minimum required permissions? (1/2): "
+            )
             
             if role_type == '1':
                 # Create role with admin permissions
-                cf_role_arn = create_cloudformation_role(cf_role_name, iam_client)
+                cf_role_task = (create_cloudformation_role, cf_role_name, iam_client)
             elif role_type == '2':
-                template_source = input("Provide template from (1) Local file path or (2) Paste content? (1/2): ")
+                template_source = '1' if args.local_template else input("Provide template from (1) Local file path or (2) Paste content? (1/2): ")
                 template_content = None
                 
                 if template_source == '1':
-                    local_template_path = input("Enter local path to CloudFormation template for analysis: ")
+                    local_template_path = prompt(args.local_template, "Enter local path to CloudFormation template for analysis: ")
                     try:
-                        with open(local_template_path, 'r') as f:
+                        with open(local_template_path, 'rb') as f:
                             template_content = f.read()
                     except FileNotFoundError:
                         print(f"Template file not found: {local_template_path}")
                 
                 elif template_source == '2':
                     print("Paste your CloudFormation template content below and press Ctrl+D (Unix) or Ctrl+Z (Windows) when done:")
-                    template_lines = []
-                    try:
-                        while True:
-                            line = input()
-                            template_lines.append(line)
-                    except EOFError:
-                        template_content = '\n'.join(template_lines)
+                    template_content = sys.stdin.read()
                 
                 else:
                     print("Invalid option selected.")
                 
                 if template_content:
-                    cf_role_arn = analyze_template_content_and_create_role(
+                    cf_role_task = (
+                        analyze_template_content_and_create_role,
                         template_content, cf_role_name, iam_client, account_id
                     )
-                
-                if not cf_role_arn:
-                    create_admin_role = input("Failed to create scoped role. Create a role with admin permissions instead? (y/n): ").lower()
-                    if create_admin_role == 'y':
-                        cf_role_arn = create_cloudformation_role(cf_role_name, iam_client)
             else:
                 print("Invalid option selected.")
-                
-            if cf_role_arn:
-                print(f"Created CloudFormation execution role with ARN: {cf_role_arn}")
         else:
-            cf_role_arn = input("Enter existing CloudFormation role ARN: ")
+            cf_role_arn = prompt(args.cf_role_arn, "Enter existing CloudFormation role ARN: ")
+        
+        # The scoped role cannot be created without template content, so settle
+        # the admin fallback before any AWS resources are created
+        if role_type == '2' and not cf_role_task and confirm_admin_fallback(args.yes):
+            cf_role_task = (create_cloudformation_role, cf_role_name, iam_client)
         
         # Ask about IAM capabilities
-        iam_confirm = input("Does this template require IAM capabilities? (y/n): ").lower()
+        if args.iam_capabilities or args.yes:
+            iam_confirm = 'y' if args.iam_capabilities else 'n'
+        else:
+            iam_confirm = input("Does this template require IAM capabilities? (y/n): ").lower()
         capabilities = ['CAPABILITY_IAM', 'CAPABILITY_NAMED_IAM'] if iam_confirm == 'y' else []
         
-        # Create artifact bucket
-        artifact_bucket = create_artifact_bucket(session, region)
+        # Create the pipeline role, CloudFormation role and artifact bucket
+        # concurrently, as none of them depends on another
+        pipeline_role_name = f"CodePipeline-{stack_name}-{secrets.token_hex(4)}"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            pipeline_role_future = executor.submit(create_pipeline_role, pipeline_role_name, iam_client, account_id)
+            cf_role_future = executor.submit(*cf_role_task) if cf_role_task else None
+            artifact_bucket_future = executor.submit(create_artifact_bucket, session, region, account_id)
+            
+            pipeline_role_arn = pipeline_role_future.result()
+            if cf_role_future:
+                cf_role_arn = cf_role_future.result()
+            artifact_bucket = artifact_bucket_future.result()
+        
+        print(f"Created pipeline role with ARN: {pipeline_role_arn}")
+        
+        # Template analysis or the IAM calls for the scoped role failed
+        if role_type == '2' and cf_role_future and not cf_role_arn and confirm_admin_fallback(args.yes):
+            cf_role_arn = create_cloudformation_role(cf_role_name, iam_client)
+        
+        if create_cf_role_input == 'y' and cf_role_arn:
+            print(f"Created CloudFormation execution role with ARN: {cf_role_arn}")
         
         # Create pipeline name
-        pipeline_name = f"{stack_name}-Pipeline-{str(uuid.uuid4())[:8]}"
+        pipeline_name = f"{stack_name}-Pipeline-{secrets.token_hex(4)}"
         
         # Confirm details
         print("\nDeployment Details:")
@@ -624,7 +887,7 @@ def main():
         if capabilities:
             print("IAM Capabilities: Enabled")
         
-        confirm = input("Do you want to proceed with the deployment? (y/n): ").lower()
+        confirm = 'y' if args.yes else input("Do you want to proceed with the deployment? (y/n): ").lower()
         
         if confirm == 'y':
             print("Creating CodePipeline...")
@@ -695,9 +958,7 @@ def main():
             
             try:
                 # Create the pipeline
-                response = pipeline_client.create_pipeline(
-                    pipeline=pipeline_definition
-                )
+                response = create_pipeline(pipeline_client, pipeline_definition)
                 
                 print(f"Pipeline created successfully!")
                 print(f"Pipeline ARN: {response['pipeline'].get('pipelineARN', 'N/A')}")
@@ -706,7 +967,10 @@ def main():
                 print("and the resulting stack in the AWS CloudFormation console.")
                 
                 # Start the pipeline execution
-                start_confirm = input("Do you want to manually start the pipeline now? (y/n): ").lower()
+                if args.start_pipeline or args.yes:
+                    start_confirm = 'y' if args.start_pipeline else 'n'
+                else:
+                    start_confirm = input("Do you want to manually start the pipeline now? (y/n): ").lower()
                 if start_confirm == 'y':
                     pipeline_client.start_pipeline_execution(name=pipeline_name)
                     print(f"Pipeline execution started for {pipeline_name}")